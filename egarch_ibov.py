@@ -1,82 +1,115 @@
-import yfinance as yf
 import numpy as np
 import pandas as pd
 from arch import arch_model
+from numba import njit, prange
 import matplotlib
 matplotlib.use('Agg')  # Use non-interactive backend
 import matplotlib.pyplot as plt
 from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+import math
+from yf_cache import cached_download
 import warnings
 warnings.filterwarnings('ignore')
 
+# E|z| for a standard normal shock, used to center the EGARCH news term
+SQRT_2_OVER_PI = math.sqrt(2 / math.pi)
+
 def fetch_data():
     """Fetch IBOVESPA data for the last 20 years"""
-    end_date = datetime.now()
+    end_date = datetime.now().date()
     start_date = end_date - timedelta(days=20*365)  # 20 years
-    ibov = yf.download('^BVSP', start=start_date, end=end_date)
+    ibov = cached_download('^BVSP', start_date, end_date)
     return ibov
 
 def calculate_returns(data):
     """Calculate log returns"""
-    return np.log(data['Close']/data['Close'].shift(1)).dropna()
+    closes = data['Close'].to_numpy(dtype=np.float64)
+    log_ret = np.diff(np.log(closes))
+    
+    # Drop returns touching missing closes, as the previous dropna did
+    mask = np.isfinite(log_ret)
+    return pd.Series(log_ret[mask], index=data.index[1:][mask], name='Close')
+
+def _fit_one(args):
+    """Fit a single EGARCH(p,q) model and return its AIC"""
+    returns, p, q = args
+    try:
+        model = arch_model(returns, p=p, q=q, vol='EGARCH', dist='normal')
+        results = model.fit(disp='off')
+        # A NaN AIC would never compare as worse, so treat it as a failed fit
+        if not np.isfinite(results.aic):
+            return p, q, np.inf
+        return p, q, results.aic
+    except Exception:
+        return p, q, np.inf
 
 def find_best_model(returns):
     """Find best EGARCH model based on AIC"""
-    best_aic = np.inf
-    best_order = None
-    
-    for p in range(1, 3):  # ARCH order
-        for q in range(1, 3):  # GARCH order
-            try:
-                model = arch_model(returns, p=p, q=q, vol='EGARCH', dist='normal')
-                results = model.fit(disp='off')
-                if results.aic < best_aic:
-                    best_aic = results.aic
-                    best_order = (p, q)
-            except:
-                continue
-    
-    return best_order
-
-def monte_carlo_simulation(model_fit, n_simulations=10000, forecast_period=21):
-    """Perform Monte Carlo simulation for future returns"""
-    params = model_fit.params
-    mu = params['mu']  # mean return
-    omega = params['omega']
-    alpha1 = params['alpha[1]']
-    alpha2 = params['alpha[2]']
-    beta1 = params['beta[1]']
-    beta2 = params['beta[2]']
+    orders = [(p, q) for p in (1, 2) for q in (1, 2)]  # (ARCH, GARCH) orders
     
-    # Initialize arrays
-    simulated_returns = np.zeros((n_simulations, forecast_period))
+    # Each fit is independent, so run them in separate processes
+    with ProcessPoolExecutor(max_workers=len(orders)) as executor:
+        results = list(executor.map(_fit_one, [(returns, p, q) for p, q in orders]))
     
-    # Get last volatility
-    last_vol = model_fit.conditional_volatility[-1]
+    p, q, best_aic = min(results, key=lambda r: r[2])
+    if not np.isfinite(best_aic):
+        return None
     
-    # Calculate annualized volatility for scaling
-    annual_vol = np.sqrt(252) * last_vol
-    
-    for sim in range(n_simulations):
-        # Initialize volatility
-        log_sigma2 = np.log(last_vol**2)
+    return (p, q)
+
+# cache=True stores the compiled kernel in __pycache__, so only the first run
+# pays the JIT warmup (numba.pycc AOT is deprecated and cannot compile prange)
+@njit(parallel=True, fastmath=True, cache=True)
+def _mc_kernel(Z, mu, omega, alpha_sum, beta_sum, last_vol, out):
+    """EGARCH Monte Carlo kernel: cumulative return of one independent path per simulation"""
+    n_sim, T = Z.shape
+    log_sigma2_0 = 2.0 * np.log(last_vol)
+    
+    # omega + alpha_sum * (|z| - E|z|) with the constant part folded in once
+    omega_c = omega - alpha_sum * SQRT_2_OVER_PI
+    
+    for sim in prange(n_sim):
+        log_sigma2 = log_sigma2_0
+        cum = 0.0
         
-        for t in range(forecast_period):
-            # Generate random shock
-            z = np.random.standard_normal()
+        for t in range(T):
+            z = Z[sim, t]
             
             # Update log-variance (EGARCH)
-            log_sigma2 = omega + alpha1 * (abs(z) - np.sqrt(2/np.pi)) + alpha2 * (abs(z) - np.sqrt(2/np.pi)) + \
-                        (beta1 + beta2) * log_sigma2
+            log_sigma2 = omega_c + alpha_sum * abs(z) + beta_sum * log_sigma2
             
             # Calculate volatility
-            sigma = np.sqrt(np.exp(log_sigma2))
+            sigma = np.exp(0.5 * log_sigma2)
             
-            # Generate return with current volatility and drift adjustment
-            r = mu - 0.5 * sigma**2 + sigma * z  # Include volatility drift adjustment
-            simulated_returns[sim, t] = r
+            # Accumulate return with current volatility and drift adjustment
+            cum += mu - 0.5 * sigma * sigma + sigma * z
+        
+        out[sim] = cum
+
+def monte_carlo_simulation(model_fit, n_simulations=10000, forecast_period=21, seed=None):
+    """Perform Monte Carlo simulation of cumulative future returns"""
+    params = model_fit.params
+    mu = float(params['mu'])  # mean return
+    omega = float(params['omega'])
+    # Lags share the same shock in the simulation, so only the sums of the
+    # ARCH and GARCH coefficients matter (works for any fitted order)
+    alpha_sum = float(params.filter(like='alpha[').sum())
+    beta_sum = float(params.filter(like='beta[').sum())
     
-    return simulated_returns
+    # Get last volatility
+    last_vol = float(model_fit.conditional_volatility.iloc[-1])
+    
+    # Draw all random shocks at once
+    rng = np.random.default_rng(seed)
+    Z = rng.standard_normal((n_simulations, forecast_period))
+    
+    # Only the per-path sum is kept, not the full path matrix
+    cumulative_returns = np.empty(n_simulations)
+    
+    _mc_kernel(Z, mu, omega, alpha_sum, beta_sum, last_vol, cumulative_returns)
+    
+    return cumulative_returns
 
 def main():
     # Fetch data
@@ -100,22 +133,25 @@ def main():
     
     # Monte Carlo simulation
     print("\nPerforming Monte Carlo simulation...")
-    simulated_returns = monte_carlo_simulation(model_fit)
+    cumulative_returns = monte_carlo_simulation(model_fit)
     
-    # Calculate cumulative returns
-    cumulative_returns = np.sum(simulated_returns, axis=1)
-    
-    # Calculate price predictions
     last_price = float(ibov['Close'].iloc[-1])  # Convert to float
-    predicted_prices = last_price * np.exp(cumulative_returns)
     
     # Calculate confidence intervals
     confidence_level = 0.99
     lower_percentile = (1 - confidence_level) / 2
     upper_percentile = 1 - lower_percentile
     
-    lower_bound = np.percentile(predicted_prices, lower_percentile * 100)
-    upper_bound = np.percentile(predicted_prices, upper_percentile * 100)
+    n_sim = len(cumulative_returns)
+    
+    # exp is monotone, so take the order statistics of the cumulative returns
+    # and only exponentiate the two bounds; the positions are symmetric so
+    # both tails leave out the same number of draws
+    lo_idx = int(round(lower_percentile * (n_sim - 1)))
+    hi_idx = n_sim - 1 - lo_idx
+    parts = np.partition(cumulative_returns, [lo_idx, hi_idx])
+    lower_bound = last_price * np.exp(parts[lo_idx])
+    upper_bound = last_price * np.exp(parts[hi_idx])
     
     # Print results
     print("\nResults:")
@@ -124,9 +160,13 @@ def main():
     print(f"Lower bound: {lower_bound:.2f}")
     print(f"Upper bound: {upper_bound:.2f}")
     
+    # Calculate price predictions for the distribution plot
+    predicted_prices = last_price * np.exp(cumulative_returns)
+    
     # Create distribution plot
     plt.figure(figsize=(10, 6))
-    plt.hist(predicted_prices, bins=50, density=True, alpha=0.7)
+    counts, edges = np.histogram(predicted_prices, bins=50, density=True)
+    plt.stairs(counts, edges, fill=True, alpha=0.7)
     plt.axvline(lower_bound, color='r', linestyle='--', label='99% CI')
     plt.axvline(upper_bound, color='r', linestyle='--')
     plt.axvline(last_price, color='g', linestyle='-', label='Current Price')
@@ -13,9 +13,55 @@ from statsmodels.tsa.seasonal import STL
 from typing import List, Tuple
 import matplotlib.pyplot as plt
 import math
+import os
+from concurrent.futures import ProcessPoolExecutor
 import ruptures as rpt
 
-def rolling_seasonal_strength(series: pd.Series, period: int = 12, window_size: int = 60, step: int = 12) -> List[Tuple[int, int, float]]:
+def _window_starts(n: int, window_size: int = 60, step: int = 12) -> np.ndarray:
+    """
+    Retorna os índices de início das janelas móveis de uma série de tamanho n.
+    """
+    return np.arange(0, n - window_size, step)
+
+def _window_tasks(values: np.ndarray, period: int = 12, window_size: int = 60, step: int = 12, robust: bool = True) -> List[Tuple[np.ndarray, int, bool]]:
+    """
+    Monta as tarefas (janela, período, robusto) das janelas móveis de uma série.
+    """
+    return [(values[start:start + window_size], period, robust)
+            for start in _window_starts(len(values), window_size, step)]
+
+def _fit_window(args: Tuple[np.ndarray, int, bool]) -> float:
+    """
+    Ajusta o STL em uma única janela e retorna a variância do componente sazonal.
+    """
+    window, period, robust = args
+    stl = STL(window, period=period, robust=robust).fit()
+    return np.var(stl.seasonal)
+
+def _window_variances(values: np.ndarray, starts: np.ndarray, window_size: int) -> np.ndarray:
+    """
+    Calcula a variância de todas as janelas via somas acumuladas, sem
+    recalcular os trechos sobrepostos entre janelas consecutivas.
+    """
+    # Centraliza para reduzir o erro de cancelamento em E[x²] - E[x]²
+    centered = values - values.mean()
+    csum = np.concatenate(([0.0], np.cumsum(centered)))
+    csum2 = np.concatenate(([0.0], np.cumsum(centered * centered)))
+    ends = starts + window_size
+    mean = (csum[ends] - csum[starts]) / window_size
+    return (csum2[ends] - csum2[starts]) / window_size - mean * mean
+
+def _strength_results(values: np.ndarray, var_seasonal: np.ndarray, window_size: int = 60, step: int = 12) -> List[Tuple[int, int, float]]:
+    """
+    Combina as variâncias sazonais de cada janela com as variâncias das janelas
+    em tuplas (início, fim, força_sazonal).
+    """
+    starts = _window_starts(len(values), window_size, step)
+    strengths = var_seasonal / _window_variances(values, starts, window_size)
+    return [(int(start), int(start) + window_size, float(strength))
+            for start, strength in zip(starts, strengths)]
+
+def rolling_seasonal_strength(series: pd.Series, period: int = 12, window_size: int = 60, step: int = 12, robust: bool = True) -> List[Tuple[int, int, float]]:
     """
     Calcula a força sazonal em janelas móveis ao longo da série temporal.
     
@@ -24,17 +70,17 @@ def rolling_seasonal_strength(series: pd.Series, period: int = 12, window_size:
     - period: Período sazonal (default: 12)
     - window_size: Tamanho da janela móvel (default: 60)
     - step: Passo entre janelas (default: 12)
+    - robust: Usa o STL robusto, resistente a outliers (default: True); False é bem mais rápido
     
     Retorna:
     - Lista de tuplas contendo (início, fim, força_sazonal) para cada janela
     """
-    results = []
-    for start in range(0, len(series) - window_size, step):
-        window = series[start:start + window_size]
-        stl = STL(window, period=period, robust=True).fit()
-        seasonal_strength = np.var(stl.seasonal) / np.var(window)
-        results.append((start, start + window_size, seasonal_strength))
-    return results
+    values = series.to_numpy(dtype=np.float64)
+    tasks = _window_tasks(values, period, window_size, step, robust)
+    var_seasonal = np.empty(len(tasks), dtype=np.float64)
+    for i, task in enumerate(tasks):
+        var_seasonal[i] = _fit_window(task)
+    return _strength_results(values, var_seasonal, window_size, step)
 
 def detect_breaks(strengths: List[float], pen: float = 10) -> List[int]:
     """
@@ -47,8 +93,12 @@ def detect_breaks(strengths: List[float], pen: float = 10) -> List[int]:
     Retorna:
     - Lista de índices onde ocorrem as quebras estruturais
     """
-    # Converte para array numpy
-    signal = np.array(strengths)
+    # Poucos pontos não permitem detectar rupturas
+    if len(strengths) < 3:
+        return []
+    
+    # Converte para array numpy contíguo em float64 (formato nativo do ruptures)
+    signal = np.ascontiguousarray(strengths, dtype=np.float64)
     
     # Aplica o algoritmo Pelt (implementação eficiente do Bai-Perron)
     # Usando modelo normal que é bom para detectar mudanças na média e variância
@@ -58,13 +108,14 @@ def detect_breaks(strengths: List[float], pen: float = 10) -> List[int]:
     # Remove o último ponto (fim da série)
     return breakpoints[:-1]
 
-def plot_all_seasonal_strengths(data: pd.DataFrame, filename: str = 'seasonal_strength.png', pen: float = 10, verbose: bool = True):
+def plot_all_seasonal_strengths(data: pd.DataFrame, filename: str = 'seasonal_strength.png', pen: float = 10, verbose: bool = True, robust: bool = True):
     """
     Plota a evolução da força sazonal ao longo do tempo para todas as séries em um grid n x n.
     
     Parâmetros:
     - data: DataFrame com as séries temporais
     - filename: Nome do arquivo PNG para salvar o plot
+    - robust: Usa o STL robusto, como em plot_stl_decomposition (default: True)
     """
     n_series = len(data.columns)
     n_rows = math.ceil(math.sqrt(n_series))
@@ -79,34 +130,49 @@ def plot_all_seasonal_strengths(data: pd.DataFrame, filename: str = 'seasonal_st
     # Dicionário para mapear índices aos nomes completos das séries
     series_names = {}
     
-    # Plota os gráficos
-    for idx, col in enumerate(data.columns, 1):
-        series = data[col].dropna()
-        results = rolling_seasonal_strength(series)
-        series_names[idx] = col
-        
-        time_ranges = [f"{series.index[start].year}" 
-                      for start, _, _ in results]
-        strengths = [strength for _, _, strength in results]
-        
-        ax = fig.add_subplot(gs[((idx-1)//n_cols), ((idx-1)%n_cols)])
-        # Plota a série de força sazonal
-        ax.plot(range(len(strengths)), strengths, marker='o', label='Força Sazonal')
-        
-        # Detecta e plota os pontos de ruptura
-        breakpoints = detect_breaks(strengths, pen=pen)
-        
-        for bp in breakpoints:
-            ax.axvline(bp, color="red", linestyle="--")
-        
-        ax.set_title(f'Série {idx}')
-        ax.set_xticks([0, len(strengths)-1])
-        ax.set_xticklabels([time_ranges[0], time_ranges[-1]], rotation=45)
-        ax.set_ylabel("Força Sazonal")
-        ax.grid(True)
+    # Monta as janelas de todas as séries
+    all_series = [data[col].dropna() for col in data.columns]
+    all_values = [series.to_numpy(dtype=np.float64) for series in all_series]
+    tasks_per_series = [_window_tasks(values, robust=robust) for values in all_values]
+    n_tasks = sum(len(series_tasks) for series_tasks in tasks_per_series)
+    
+    n_cores = os.cpu_count() or 1
+    chunksize = max(1, n_tasks // (4 * n_cores))
+    with ProcessPoolExecutor() as executor:
+        # Submete os ajustes STL de todas as séries de uma vez; enquanto uma
+        # série é plotada, os processos continuam ajustando as seguintes
+        pending = [executor.map(_fit_window, series_tasks, chunksize=chunksize)
+                   for series_tasks in tasks_per_series]
         
-        if len(breakpoints) > 0:
-            ax.set_title(f'Série {idx} ({len(breakpoints)} rupturas)')
+        # Plota os gráficos na ordem, conforme cada série fica pronta
+        for idx, (col, series, values, series_tasks, fits) in enumerate(
+                zip(data.columns, all_series, all_values, tasks_per_series, pending), 1):
+            var_seasonal = np.fromiter(fits, dtype=np.float64, count=len(series_tasks))
+            results = _strength_results(values, var_seasonal)
+            series_names[idx] = col
+            
+            time_ranges = [f"{series.index[start].year}" 
+                          for start, _, _ in results]
+            strengths = [strength for _, _, strength in results]
+            
+            ax = fig.add_subplot(gs[((idx-1)//n_cols), ((idx-1)%n_cols)])
+            # Plota a série de força sazonal
+            ax.plot(range(len(strengths)), strengths, marker='o', label='Força Sazonal')
+            
+            # Detecta e plota os pontos de ruptura
+            breakpoints = detect_breaks(strengths, pen=pen)
+            
+            for bp in breakpoints:
+                ax.axvline(bp, color="red", linestyle="--")
+            
+            ax.set_title(f'Série {idx}')
+            ax.set_xticks([0, len(strengths)-1])
+            ax.set_xticklabels([time_ranges[0], time_ranges[-1]], rotation=45)
+            ax.set_ylabel("Força Sazonal")
+            ax.grid(True)
+            
+            if len(breakpoints) > 0:
+                ax.set_title(f'Série {idx} ({len(breakpoints)} rupturas)')
     
     # Adiciona a legenda em texto na parte inferior
     legend_text = "Legenda:\n" + "\n".join([f"Série {idx}: {name}" for idx, name in series_names.items()])
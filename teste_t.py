@@ -1,31 +1,85 @@
-import yfinance as yf
 import pandas as pd
 import numpy as np
-from scipy.stats import ttest_rel, shapiro
+from scipy.stats import ttest_rel, shapiro, normaltest
+from yf_cache import cached_download
 
 
 def calc_monthly_returns(df, ret_type='simple'):
     """Calcula retornos mensais de um DataFrame com dados financeiros"""
-    df = df.reset_index()
-    df['Date'] = pd.to_datetime(df['Date'])
-    df['month'] = df['Date'].dt.month
-    df['year'] = df['Date'].dt.year
+    close = df['Close'].copy()
+    close.index = pd.to_datetime(close.index)
 
-    # Agrupa por mês/ano e pega o último valor ajustado
-    grouped = df.groupby(['year', 'month']).agg({
-        'Date': 'last',
-        'Close': 'last'
-    }).reset_index()
+    # Reamostra no fim de cada mês e pega o último valor ajustado
+    s = close.resample('ME').last().dropna()
 
     # Calcula retornos
     if ret_type == 'log':
-        grouped['monthly_returns'] = np.log(grouped['Close'] /
-                                            grouped['Close'].shift(1))
+        ret = np.log(s / s.shift(1)).dropna()
     else:
-        grouped['monthly_returns'] = (grouped['Close'] /
-                                      grouped['Close'].shift(1)) - 1
+        ret = s.pct_change().dropna()
 
-    return grouped.dropna(subset=['monthly_returns'])
+    return ret.rename('monthly_returns')
+
+
+def paired_monthly_returns(ticker_fund,
+                           ticker_index,
+                           start_date='2014-01-01',
+                           end_date='2023-12-31',
+                           ret_type='simple'):
+    """Retornos mensais de um fundo e um índice alinhados pela data"""
+    # Obtém dados do Yahoo Finance (com cache local)
+    df_fund = cached_download(ticker_fund, start_date, end_date)
+    df_index = cached_download(ticker_index, start_date, end_date)
+
+    # Calcula retornos mensais
+    ret_fund = calc_monthly_returns(df_fund, ret_type)
+    ret_index = calc_monthly_returns(df_index, ret_type)
+
+    # Alinha os retornos pela data de fim de mês
+    return pd.concat({'fund': ret_fund, 'index': ret_index}, axis=1).dropna()
+
+
+def batch_normality(pairs,
+                    start_date='2014-01-01',
+                    end_date='2023-12-31',
+                    ret_type='simple'):
+    """Testa a normalidade das diferenças de vários pares (fundo, índice) em lote.
+
+    Cada par é testado sobre todo o seu histórico alinhado; pares com as mesmas
+    datas são empilhados e testados juntos. Retorna estatística, valor-p e o
+    número de meses usados por par.
+    """
+    differences = {}
+    for ticker_fund, ticker_index in pairs:
+        merged = paired_monthly_returns(ticker_fund, ticker_index, start_date,
+                                        end_date, ret_type)
+        differences[(ticker_fund, ticker_index)] = merged['fund'] - merged['index']
+
+    # normaltest exige pelo menos 8 observações por série
+    for (ticker_fund, ticker_index), diff in differences.items():
+        if len(diff) < 8:
+            raise ValueError(
+                f"normaltest exige pelo menos 8 meses; o par {ticker_fund} x "
+                f"{ticker_index} tem {len(diff)}")
+
+    # Agrupa os pares com o mesmo histórico alinhado e aplica o teste de
+    # D'Agostino-Pearson em uma única chamada por grupo (n_pares, n_meses),
+    # sem truncar nenhum par aos meses em comum com os demais
+    groups = {}
+    for pair, diff in differences.items():
+        groups.setdefault(tuple(diff.index), []).append(pair)
+
+    rows = {}
+    for group in groups.values():
+        D = np.vstack([differences[pair].to_numpy() for pair in group])
+        stat, p_value = normaltest(D, axis=1)
+        for pair, pair_stat, pair_p in zip(group, stat, p_value):
+            rows[pair] = (pair_stat, pair_p, D.shape[1])
+
+    return pd.DataFrame([rows[pair] for pair in differences],
+                        columns=['normaltest_stat', 'normaltest_p', 'n_months'],
+                        index=pd.MultiIndex.from_tuples(list(differences),
+                                                        names=['fund', 'index']))
 
 
 def compare_with_risk_normality(ticker_fund,
@@ -34,38 +88,22 @@ def compare_with_risk_normality(ticker_fund,
                                 end_date='2023-12-31',
                                 ret_type='simple'):
     """Compara retornos mensais de um fundo e um índice"""
-    # Obtém dados do Yahoo Finance
-    df_fund = yf.download(ticker_fund, start=start_date, end=end_date)
-    df_index = yf.download(ticker_index, start=start_date, end=end_date)
-
-    # Remove MultiIndex e mantém apenas o nível inferior das colunas
-    if isinstance(df_fund.columns, pd.MultiIndex):
-        df_fund.columns = df_fund.columns.droplevel(1)
-    if isinstance(df_index.columns, pd.MultiIndex):
-        df_index.columns = df_index.columns.droplevel(1)
-
-    # Calcula retornos mensais
-    ret_fund = calc_monthly_returns(df_fund, ret_type)
-    ret_index = calc_monthly_returns(df_index, ret_type)
-
-    # Merge dos retornos para teste t pareado
-    merged = pd.merge(ret_fund,
-                      ret_index,
-                      on=['year', 'month'],
-                      suffixes=('_fund', '_index'))
+    # Retornos mensais alinhados para o teste t pareado
+    merged = paired_monthly_returns(ticker_fund, ticker_index, start_date,
+                                    end_date, ret_type)
+    fund = merged['fund'].to_numpy()
+    index = merged['index'].to_numpy()
 
     # Calcula as diferenças dos retornos
-    merged['differences'] = merged['monthly_returns_fund'] - merged[
-        'monthly_returns_index']
+    differences = fund - index
 
     # Teste de normalidade (Shapiro-Wilk) nas diferenças
-    stat_shapiro, p_shapiro = shapiro(merged['differences'])
+    stat_shapiro, p_shapiro = shapiro(differences)
 
     # Teste t pareado
-    t_result = ttest_rel(merged['monthly_returns_fund'],
-                         merged['monthly_returns_index'])
-    mean_fund = merged['monthly_returns_fund'].mean()
-    mean_index = merged['monthly_returns_index'].mean()
+    t_result = ttest_rel(fund, index)
+    mean_fund = fund.mean()
+    mean_index = index.mean()
 
     print(
         "========== COMPARAÇÃO: {} (Fundo) vs. {} (Índice) ==========".format(
@@ -0,0 +1,71 @@
+import yfinance as yf
+import pandas as pd
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+CACHE_DIR = Path('.yfcache')
+
+def _as_date(value):
+    """Normalize str/datetime/date inputs to a date"""
+    if isinstance(value, str):
+        return date.fromisoformat(value)
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+def _is_open_range(end, fetched_on):
+    """Whether a range was still receiving new data when it was downloaded"""
+    return end >= fetched_on - timedelta(days=1)
+
+def _prune_open_ranges(ticker, keep):
+    """Remove older rolling-window files for a ticker, superseded by `keep`.
+
+    Only files fetched on previous days are removed: files fetched today may
+    belong to another caller using a different start. Files whose range had
+    already closed when downloaded are kept, since they may still be
+    requested with the same (start, end) key.
+    """
+    today = date.today()
+    for path in CACHE_DIR.glob(f"{ticker}_*.parquet"):
+        if path == keep:
+            continue
+        parts = path.stem[len(ticker) + 1:].split('_')
+        if len(parts) != 2:
+            continue
+        end = date.fromisoformat(parts[1])
+        fetched_on = date.fromtimestamp(path.stat().st_mtime)
+        if fetched_on < today and _is_open_range(end, fetched_on):
+            path.unlink()
+
+def cached_download(ticker, start, end):
+    """Download data from Yahoo Finance, caching it locally as parquet.
+
+    Ranges that had already closed (ended before yesterday) when downloaded
+    are immutable and served from disk forever; more recent ranges are
+    re-downloaded once per day, and the files of previous days' rolling
+    ranges for the same ticker are removed. Raises ValueError if Yahoo
+    Finance returns no data, so a failed download is never cached.
+    """
+    start, end = _as_date(start), _as_date(end)
+    path = CACHE_DIR / f"{ticker}_{start}_{end}.parquet"
+
+    if path.exists():
+        fetched_on = date.fromtimestamp(path.stat().st_mtime)
+        if not _is_open_range(end, fetched_on) or fetched_on == date.today():
+            return pd.read_parquet(path, engine='pyarrow')
+
+    df = yf.download(ticker, start=start, end=end)
+
+    # yf.download logs failures and returns an empty frame instead of raising
+    if df.empty:
+        raise ValueError(f"No data downloaded for {ticker} ({start} to {end})")
+
+    # Drop the ticker level from yfinance's (price, ticker) column MultiIndex
+    if isinstance(df.columns, pd.MultiIndex):
+        df.columns = df.columns.droplevel(1)
+
+    CACHE_DIR.mkdir(exist_ok=True)
+    df.to_parquet(path, engine='pyarrow')
+    if _is_open_range(end, date.today()):
+        _prune_open_ranges(ticker, keep=path)
+    return df